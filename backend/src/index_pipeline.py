@@ -0,0 +1,166 @@
+"""
+Index Pipeline Module
+Builds the lexicon, forward index and inverted index in a single pass over
+the documents.
+"""
+
+from array import array
+
+import numpy as np
+import pyarrow.compute as pc
+
+from .document_processor import document_tokens
+from .forward_index_builder import ForwardIndex
+from .inverted_index_builder import InvertedIndexBuilder
+
+
+class _Vocabulary(dict):
+    """word -> provisional word_id map that assigns the next ID on first sight."""
+    
+    def __missing__(self, word):
+        word_id = self[word] = len(self)
+        return word_id
+
+
+class LexiconAndForwardBuilder:
+    """Builds the lexicon and the forward index together in one scan."""
+    
+    def __init__(self):
+        """Initialize the builder."""
+        self._vocabulary = _Vocabulary()
+        self._doc_ids = []
+        self._lengths = array('q')
+        self._word_ids = array('i')
+    
+    def build(self, documents):
+        """
+        Build the lexicon and forward index from processed documents.
+        
+        Args:
+            documents: Iterable of document dictionaries with 'tokens' field,
+                       or of (doc_id, tokens) tuples
+        
+        Returns:
+            Tuple of (lexicon, forward_index), identical to what
+            LexiconBuilder and ForwardIndexBuilder build separately
+        """
+        print("Building lexicon and forward index...")
+        self.add_documents(documents)
+        return self.finish()
+    
+    def add_document(self, doc_id, tokens):
+        """
+        Add one tokenized document.
+        Tokens are mapped to word IDs in C; only words never seen before
+        cost a Python-level call.
+        
+        Args:
+            doc_id: Document ID
+            tokens: List of word tokens
+        """
+        self._doc_ids.append(doc_id)
+        self._lengths.append(len(tokens))
+        self._word_ids.extend(map(self._vocabulary.__getitem__, tokens))
+        
+        # Progress indicator
+        if len(self._doc_ids) % 10000 == 0:
+            print(f"Indexed {len(self._doc_ids)} documents...")
+    
+    def add_documents(self, documents):
+        """
+        Add a stream of tokenized documents.
+        
+        Args:
+            documents: Iterable of document dictionaries with 'tokens' field,
+                       or of (doc_id, tokens) tuples
+        """
+        for doc_id, tokens in map(document_tokens, documents):
+            self.add_document(doc_id, tokens)
+    
+    def add_token_array(self, doc_ids, offsets, tokens):
+        """
+        Add a batch of documents tokenized by TextPreprocessor.tokenize_array.
+        Tokens are hashed by pyarrow's dictionary encoding; only the batch's
+        distinct words go through the Python vocabulary.
+        
+        Args:
+            doc_ids: Document IDs of the batch
+            offsets: Token offsets, one more than there are documents
+            tokens: Flat pyarrow string array of the batch's tokens
+        """
+        encoded = pc.dictionary_encode(tokens)
+        words = encoded.dictionary.to_pylist()
+        batch_ids = np.fromiter(map(self._vocabulary.__getitem__, words),
+                                dtype=np.intc, count=len(words))
+        
+        self._doc_ids.extend(doc_ids)
+        self._lengths.frombytes(np.diff(offsets).astype(np.int64).tobytes())
+        self._word_ids.frombytes(batch_ids[encoded.indices.to_numpy()].tobytes())
+        print(f"Indexed {len(self._doc_ids)} documents...")
+    
+    def finish(self):
+        """
+        Assign final word IDs and assemble the forward index.
+        
+        Word IDs are handed out in first-seen order while documents are
+        added; here they are renumbered so the lexicon is in sorted word
+        order, exactly as LexiconBuilder would have produced it.
+        
+        Returns:
+            Tuple of (lexicon, forward_index)
+        """
+        sorted_words = sorted(self._vocabulary)
+        lexicon = dict(zip(sorted_words, range(len(sorted_words))))
+        
+        # provisional ID -> final ID
+        renumber = np.empty(len(sorted_words), dtype=np.int32)
+        renumber[[self._vocabulary[word] for word in sorted_words]] = np.arange(
+            len(sorted_words), dtype=np.int32
+        )
+        values = renumber[np.frombuffer(self._word_ids, dtype=np.intc)]
+        
+        offsets = np.zeros(len(self._lengths) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self._lengths, dtype=np.int64), out=offsets[1:])
+        
+        forward_index = ForwardIndex(self._doc_ids, offsets, values)
+        print(f"Indexed {len(forward_index)} documents, {len(lexicon)} unique words")
+        return lexicon, forward_index
+
+
+class IndexPipeline(LexiconAndForwardBuilder):
+    """Fused indexing pipeline (documents -> lexicon + forward + inverted index)."""
+    
+    def __init__(self, barrel_manager=None):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            barrel_manager: Instance of BarrelManager (optional)
+        """
+        super().__init__()
+        self.inverted_builder = InvertedIndexBuilder(barrel_manager)
+        self.barrel_manager = self.inverted_builder.barrel_manager
+    
+    def finish(self):
+        """
+        Assign final word IDs and write the inverted index to barrels.
+        
+        Returns:
+            Tuple of (lexicon, forward_index)
+        """
+        lexicon, forward_index = super().finish()
+        self.inverted_builder.build_from_forward_index(forward_index)
+        return lexicon, forward_index
+
+
+# Test the index pipeline
+if __name__ == "__main__":
+    from document_processor import DocumentProcessor
+    from barrel_manager import BarrelManager
+    
+    processor = DocumentProcessor('Dataset/IPL/all_season_details.csv')
+    pipeline = IndexPipeline(BarrelManager(output_dir='test_barrels', barrel_size=100))
+    pipeline.add_documents(processor.iter_documents(max_docs=100))
+    lexicon, forward_index = pipeline.finish()
+    
+    print(f"\nLexicon: {len(lexicon)} words, forward index: {len(forward_index)} documents")
@@ -3,29 +3,364 @@ Barrel Manager Module
 Handles partitioning of the inverted index into smaller chunks (barrels).
 """
 
+import array
+import io
+import mmap
 import os
 import pickle
-from collections import defaultdict
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+import numpy as np
+
+try:
+    from pyroaring import BitMap
+except ImportError:  # optional; queries fall back to NumPy set operations
+    BitMap = None
+
+# MAP_POPULATE pre-faults the whole mapping in one go (Linux only)
+MAP_POPULATE = getattr(mmap, 'MAP_POPULATE', 0)
+
+# Format version byte at the start of compressed postings files
+FORMAT_VARBYTE = 1
+# What load_barrel returns (and caches) for a barrel that does not exist
+EMPTY_BARREL = MappingProxyType({})
+
+
+def _map_populated(f, dtype, count, offset):
+    """Map count items of dtype starting at offset of an open file, pre-faulted."""
+    if not count:
+        return np.empty(0, dtype=dtype)
+    mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE | MAP_POPULATE,
+                   prot=mmap.PROT_READ)
+    return np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+
+
+def _map_npy(path, populate=False):
+    """
+    Memory-map a .npy file read-only.
+    
+    Args:
+        path: Path of the .npy file
+        populate: Pre-fault every page of the file up front (Linux only)
+        
+    Returns:
+        Read-only array backed by the mapping
+    """
+    if not (populate and MAP_POPULATE):
+        return np.load(path, mmap_mode='r')
+    
+    with open(path, 'rb') as f:
+        shape, fortran_order, dtype = _read_npy_header(f)
+        array = _map_populated(f, dtype, int(np.prod(shape)), f.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def _read_npy_header(f):
+    """Read a .npy header, leaving f positioned at the start of the data."""
+    if np.lib.format.read_magic(f) == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    return np.lib.format.read_array_header_2_0(f)
+
+
+def _map_postings_bin(path, populate=False):
+    """
+    Memory-map a compressed postings file read-only.
+    
+    Args:
+        path: Path of the .bin file
+        populate: Pre-fault every page of the file up front (Linux only)
+        
+    Returns:
+        Tuple of (format_version, uint8 array of encoded postings)
+    """
+    with open(path, 'rb') as f:
+        header = f.read(1)
+        if len(header) != 1:
+            raise ValueError(f"{path} has no format header")
+        size = os.fstat(f.fileno()).st_size - 1
+        if populate and MAP_POPULATE:
+            data = _map_populated(f, np.uint8, size, 1)
+        elif size:
+            data = np.memmap(f, dtype=np.uint8, mode='r', offset=1, shape=(size,))
+        else:
+            data = np.empty(0, dtype=np.uint8)
+    return header[0], data
+
+
+def _varbyte_encode(values):
+    """
+    Variable-byte encode non-negative integers, 7 bits per byte, least
+    significant group first; the high bit marks that more bytes follow.
+    
+    Args:
+        values: Array of non-negative integers below 2**32
+        
+    Returns:
+        Tuple of (uint8 array of encoded bytes, bytes used per value)
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28):
+        nbytes += values >= (1 << shift)
+    
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    starts = np.cumsum(nbytes) - nbytes
+    for k in range(5):
+        has_byte = nbytes > k
+        if not has_byte.any():
+            break
+        group = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[has_byte] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has_byte] + k] = group | more
+    return out, nbytes
+
+
+def _varbyte_decode(data):
+    """
+    Decode a _varbyte_encode byte stream.
+    
+    Args:
+        data: uint8 array of encoded bytes
+        
+    Returns:
+        int64 array of decoded values
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    last = data < 0x80
+    starts = np.concatenate(([0], np.flatnonzero(last)[:-1] + 1))
+    value_index = np.cumsum(last) - last
+    shifts = 7 * (np.arange(len(data)) - starts[value_index])
+    groups = (data & 0x7F).astype(np.int64) << shifts
+    return np.bitwise_or.reduceat(groups, starts)
+
+
+def _write_file(path, buffers):
+    """
+    Write a file as a sequence of buffers and atomically swap it into place,
+    so readers that still have the old file mapped keep seeing its old
+    contents. Large buffers go straight to the OS without being joined.
+    
+    Args:
+        path: Destination path
+        buffers: Sequence of bytes-like objects to write, in order
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.writelines(buffers)
+    os.replace(tmp_path, path)
+
+
+def _npy_buffers(array):
+    """Split an array into .npy header bytes and a view of its data."""
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, np.lib.format.header_data_from_array_1_0(array))
+    return [header.getvalue(), memoryview(np.ascontiguousarray(array)).cast('B')]
+
+
+def _to_bitmap(doc_ids):
+    """Build a RoaringBitmap from doc_ids through a uint32 buffer."""
+    buffer = np.asarray(doc_ids, dtype=np.uint32).tobytes()
+    return BitMap(array.array('I', buffer))
+
+
+class FileStore:
+    """Barrel storage in a directory on disk; files are memory-mapped on load."""
+    
+    def __init__(self, root):
+        """
+        Initialize the store, creating the directory if needed.
+        
+        Args:
+            root: Directory to store barrel files
+        """
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+    
+    def __repr__(self):
+        return f"FileStore({self.root!r})"
+    
+    def _path(self, name):
+        return os.path.join(self.root, name)
+    
+    def names(self):
+        """Return the names of all stored files."""
+        return os.listdir(self.root)
+    
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+    
+    def remove(self, name):
+        if os.path.exists(self._path(name)):
+            os.remove(self._path(name))
+    
+    def write(self, name, buffers):
+        _write_file(self._path(name), buffers)
+    
+    def read_bytes(self, name):
+        with open(self._path(name), 'rb') as f:
+            return f.read()
+    
+    def map_npy(self, name, populate=False):
+        return _map_npy(self._path(name), populate)
+    
+    def map_postings_bin(self, name, populate=False):
+        return _map_postings_bin(self._path(name), populate)
+
+
+class MemoryStore:
+    """
+    Barrel storage held in memory, with the same interface as FileStore.
+    Useful for tests and short-lived indexes that never need to hit disk;
+    loaded arrays are zero-copy views of the stored bytes.
+    """
+    
+    def __init__(self):
+        self.files = {}
+    
+    def __repr__(self):
+        return f"MemoryStore({len(self.files)} files)"
+    
+    def names(self):
+        """Return the names of all stored files."""
+        return list(self.files)
+    
+    def exists(self, name):
+        return name in self.files
+    
+    def remove(self, name):
+        self.files.pop(name, None)
+    
+    def write(self, name, buffers):
+        self.files[name] = b''.join(buffers)
+    
+    def read_bytes(self, name):
+        return self.files[name]
+    
+    def map_npy(self, name, populate=False):
+        data = self.files[name]
+        f = io.BytesIO(data)
+        shape, fortran_order, dtype = _read_npy_header(f)
+        array = np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)), offset=f.tell())
+        return array.reshape(shape, order='F' if fortran_order else 'C')
+    
+    def map_postings_bin(self, name, populate=False):
+        data = self.files[name]
+        if not data:
+            raise ValueError(f"{name} has no format header")
+        return data[0], np.frombuffer(data, dtype=np.uint8, offset=1)
+
+
+class Barrel(Mapping):
+    """
+    Read-only word_id -> doc_ids view over one barrel's flat arrays.
+    
+    The doc_ids of the word first_word_id + i are
+    postings[offsets[i]:offsets[i + 1]]. For compressed barrels that slice
+    holds the word's delta + varbyte encoded doc_ids instead.
+    """
+    
+    def __init__(self, first_word_id, offsets, postings, compressed=False):
+        """
+        Initialize the barrel view.
+        
+        Args:
+            first_word_id: Word ID of the first slot in this barrel
+            offsets: Array of length barrel_size + 1
+            postings: Flat int32 array of doc_ids, or uint8 array of encoded
+                      bytes if compressed
+            compressed: Whether postings are delta + varbyte encoded
+        """
+        self.first_word_id = first_word_id
+        self.offsets = offsets
+        self.postings = postings
+        self.compressed = compressed
+        self._bitmaps = {}
+    
+    def _slot(self, word_id):
+        """Return the local slot of word_id, or None if it has no postings."""
+        slot = word_id - self.first_word_id
+        if 0 <= slot < len(self.offsets) - 1 and self.offsets[slot] != self.offsets[slot + 1]:
+            return slot
+        return None
+    
+    def __getitem__(self, word_id):
+        slot = self._slot(word_id)
+        if slot is None:
+            raise KeyError(word_id)
+        postings = self.postings[self.offsets[slot]:self.offsets[slot + 1]]
+        if self.compressed:
+            return np.cumsum(_varbyte_decode(postings)).astype(np.int32)
+        return postings
+    
+    def __contains__(self, word_id):
+        return self._slot(word_id) is not None
+    
+    def bitmap(self, word_id):
+        """
+        Get a word's doc_ids as a RoaringBitmap (requires pyroaring).
+        Bitmaps are built on first use and kept with the barrel.
+        
+        Args:
+            word_id: Word ID to look up
+            
+        Returns:
+            pyroaring.BitMap of document IDs (empty if the word is absent)
+        """
+        if word_id not in self._bitmaps:
+            self._bitmaps[word_id] = _to_bitmap(self.get(word_id, ()))
+        return self._bitmaps[word_id]
+    
+    def __iter__(self):
+        present = np.flatnonzero(np.diff(self.offsets)) + self.first_word_id
+        return iter(present.tolist())
+    
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self.offsets)))
 
 
 class BarrelManager:
     """Manages creation, storage, and loading of index barrels."""
     
-    def __init__(self, output_dir='barrels', barrel_size=2500):
+    def __init__(self, output_dir='barrels', barrel_size=2500, append_mode=False,
+                 cache_size=32, populate=False, write_workers=8, compress=False):
         """
         Initialize the barrel manager.
         
         Args:
-            output_dir: Directory to store barrel files
+            output_dir: Directory to store barrel files, or a storage object
+                        such as MemoryStore
             barrel_size: Number of words per barrel (approximate)
+            append_mode: Merge flushed data into existing barrel files instead
+                         of overwriting them (needed for incremental builds)
+            cache_size: Number of mapped barrels kept open (LRU eviction)
+            populate: Pre-fault mapped barrels on load; useful for a
+                      long-running query server (Linux only)
+            write_workers: Number of threads used to encode and write barrels
+            compress: Store posting lists delta + varbyte encoded; files are
+                      several times smaller but lookups decode instead of
+                      returning zero-copy views
         """
         self.output_dir = output_dir
+        if isinstance(output_dir, (str, os.PathLike)):
+            self.store = FileStore(output_dir)
+        else:
+            self.store = output_dir
         self.barrel_size = barrel_size
-        self.barrels_buffer = defaultdict(lambda: defaultdict(list))
-        
-        # Create output directory if it doesn't exist
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        self.append_mode = append_mode
+        self.cache_size = cache_size
+        self.populate = populate
+        self.write_workers = write_workers
+        self.compress = compress
+        # word_id -> doc_ids (int32 arrays); grouped into barrels only when flushing
+        self.barrels_buffer = {}
+        self._barrel_cache = OrderedDict()
             
     def get_barrel_id(self, word_id):
         """
@@ -51,65 +386,261 @@ class BarrelManager:
             word_id: Word ID
             doc_id: Document ID
         """
-        barrel_id = self.get_barrel_id(word_id)
-        self.barrels_buffer[barrel_id][word_id].append(doc_id)
+        doc_ids = self.barrels_buffer.get(word_id)
+        if doc_ids is None:
+            # Unboxed 4-byte doc_ids instead of a list of int objects
+            doc_ids = self.barrels_buffer[word_id] = array.array('i')
+        elif type(doc_ids) is not array.array:
+            # Posting arrays from add_postings become growable once
+            doc_ids = self.barrels_buffer[word_id] = array.array(
+                'i', doc_ids.astype(np.intc).tobytes())
+        # Skip the common repeat of a word within one document; any other
+        # duplicates are removed when the barrel is flushed
+        if not doc_ids or doc_ids[-1] != doc_id:
+            doc_ids.append(doc_id)
         
-    def flush_barrels(self):
+    def add_postings(self, word_id, doc_ids):
         """
-        Write all buffered barrel data to disk.
-        Existing barrel files are updated (merged).
+        Add a complete, deduplicated posting list for a word.
+        Arrays are buffered as given (int32 views are not copied).
+        
+        Args:
+            word_id: Word ID
+            doc_ids: Sorted list or array of unique document IDs containing the word
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        buffered = self.barrels_buffer.get(word_id)
+        if buffered is None:
+            self.barrels_buffer[word_id] = doc_ids
+        else:
+            self.barrels_buffer[word_id] = np.concatenate((buffered, doc_ids))
+        
+    def _group_by_barrel(self):
         """
-        print(f"Flushing {len(self.barrels_buffer)} barrels to disk...")
+        Group the buffered posting lists by barrel.
         
-        for barrel_id, new_data in self.barrels_buffer.items():
-            barrel_path = os.path.join(self.output_dir, f"barrel_{barrel_id}.pkl")
+        Returns:
+            Dictionary mapping barrel_id -> {word_id: doc_ids}, in word_id order
+        """
+        barrels = {}
+        for word_id in sorted(self.barrels_buffer):
+            barrel_id = self.get_barrel_id(word_id)
+            barrel_data = barrels.get(barrel_id)
+            if barrel_data is None:
+                barrel_data = barrels[barrel_id] = {}
+            barrel_data[word_id] = self.barrels_buffer[word_id]
+        return barrels
+        
+    def _barrel_names(self, barrel_id, compressed=False):
+        """
+        Get the file names of a barrel within the store.
+        
+        Args:
+            barrel_id: ID of the barrel
+            compressed: Whether to return the compressed postings name
             
-            # Load existing data if file exists
-            current_data = {}
-            if os.path.exists(barrel_path):
-                try:
-                    with open(barrel_path, 'rb') as f:
-                        current_data = pickle.load(f)
-                except Exception as e:
-                    print(f"Warning: Could not load barrel {barrel_id}: {e}")
+        Returns:
+            Tuple of (postings_name, offsets_name)
+        """
+        postings_ext = 'bin' if compressed else 'npy'
+        return f"barrel_{barrel_id}_postings.{postings_ext}", f"barrel_{barrel_id}_offsets.npy"
+    
+    def _encode_barrel(self, barrel_id, barrel_data):
+        """
+        Encode one barrel as a flat postings array plus per-word offsets.
+        
+        Args:
+            barrel_id: ID of the barrel
+            barrel_data: Dictionary mapping word_id -> doc_ids
             
-            # Merge new data
+        Returns:
+            List of (name, buffers) pairs to write
+        """
+        word_ids = sorted(barrel_data)
+        doc_lists = [barrel_data[word_id] for word_id in word_ids]
+        
+        counts = np.zeros(self.barrel_size, dtype=np.int32)
+        slots = np.asarray(word_ids, dtype=np.int64) - barrel_id * self.barrel_size
+        counts[slots] = [len(doc_ids) for doc_ids in doc_lists]
+        
+        offsets = np.zeros(self.barrel_size + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        postings = np.concatenate(doc_lists).astype(np.int32, copy=False)
+        
+        postings_name, offsets_name = self._barrel_names(barrel_id, self.compress)
+        if not self.compress:
+            return [(postings_name, _npy_buffers(postings)), (offsets_name, _npy_buffers(offsets))]
+        
+        # Sort each word's doc_ids, then store gaps; every list restarts from 0
+        word_of_posting = np.repeat(np.arange(self.barrel_size), counts)
+        postings = postings[np.lexsort((postings, word_of_posting))].astype(np.int64)
+        deltas = np.diff(postings, prepend=0)
+        first_postings = offsets[:-1][counts > 0]
+        deltas[first_postings] = postings[first_postings]
+        
+        encoded, nbytes = _varbyte_encode(deltas)
+        byte_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(nbytes, out=byte_offsets[1:])
+        
+        data = [bytes([FORMAT_VARBYTE]), memoryview(encoded)]
+        return [(postings_name, data), (offsets_name, _npy_buffers(byte_offsets[offsets]))]
+    
+    def _flush_barrel(self, barrel_id, new_data):
+        """
+        Merge (in append mode), encode and write a single barrel.
+        
+        Args:
+            barrel_id: ID of the barrel
+            new_data: Dictionary mapping word_id -> buffered doc_ids
+        """
+        if self.append_mode:
+            # Copy the old postings out of the file mapping, so nothing maps
+            # the files while they are replaced (which Windows refuses)
+            current_data = {word_id: np.array(doc_ids) for word_id, doc_ids
+                            in (self._read_barrel(barrel_id) or {}).items()}
+            
+            # Merge new data (union1d also sorts and removes duplicates)
             for word_id, doc_ids in new_data.items():
                 if word_id in current_data:
-                    # Append new doc_ids and remove duplicates
-                    current_data[word_id] = list(set(current_data[word_id] + doc_ids))
+                    current_data[word_id] = np.union1d(current_data[word_id], doc_ids)
                 else:
-                    current_data[word_id] = list(set(doc_ids))
-            
-            # Save back to file
-            with open(barrel_path, 'wb') as f:
-                pickle.dump(current_data, f)
+                    current_data[word_id] = np.unique(doc_ids)
+            new_data = current_data
+        else:
+            # Lists from add_postings are already unique; ones grown by
+            # add_to_barrel may still hold out-of-order duplicates
+            new_data = {word_id: np.unique(doc_ids) if type(doc_ids) is array.array else doc_ids
+                        for word_id, doc_ids in new_data.items()}
+        
+        for name, buffers in self._encode_barrel(barrel_id, new_data):
+            self.store.write(name, buffers)
+        
+    def flush_barrels(self):
+        """
+        Write all buffered barrel data to disk.
+        In append mode existing barrel files are updated (merged), otherwise
+        they are overwritten with the buffered data.
         
-        # Clear buffer
+        Barrels are independent partitions of the word ID space, so each one
+        is merged, encoded and written by its own worker thread; NumPy
+        releases the GIL for the heavy array work.
+        """
+        barrels = self._group_by_barrel()
+        print(f"Flushing {len(barrels)} barrels to disk...")
+        
+        # Close cached mappings of the files about to be replaced; the
+        # workers read around the cache, which is not thread-safe
+        for barrel_id in barrels:
+            self.invalidate(barrel_id)
+        
+        if len(barrels) <= 1 or self.write_workers <= 1:
+            for barrel_id, new_data in barrels.items():
+                self._flush_barrel(barrel_id, new_data)
+        else:
+            with ThreadPoolExecutor(max_workers=self.write_workers) as executor:
+                # list() re-raises the first error, if any
+                list(executor.map(self._flush_barrel, barrels, barrels.values()))
+        
+        # Drop postings left over in the other format
+        for barrel_id in barrels:
+            self.store.remove(self._barrel_names(barrel_id, not self.compress)[0])
         self.barrels_buffer.clear()
         print("Barrels flushed successfully.")
 
+    def invalidate(self, barrel_id):
+        """
+        Evict a barrel from the load cache so the next lookup rereads it.
+        
+        Args:
+            barrel_id: ID of the barrel to evict
+        """
+        self._barrel_cache.pop(barrel_id, None)
+
     def load_barrel(self, barrel_id):
         """
-        Load a specific barrel into memory.
+        Load a specific barrel.
+        The barrel arrays are memory-mapped, so only the pages that are
+        actually read get pulled from disk. The most recently used barrels,
+        including ones found missing, are cached so repeated lookups skip
+        the stat/open/map syscalls entirely.
         
         Args:
             barrel_id: ID of the barrel to load
             
         Returns:
-            Dictionary mapping word_id -> list of doc_ids, or empty dict if not found
+            Read-only mapping of word_id -> array of doc_ids (empty if the
+            barrel does not exist); cached, so callers must not modify it
         """
-        barrel_path = os.path.join(self.output_dir, f"barrel_{barrel_id}.pkl")
+        if barrel_id in self._barrel_cache:
+            self._barrel_cache.move_to_end(barrel_id)
+            return self._barrel_cache[barrel_id]
         
-        if not os.path.exists(barrel_path):
+        barrel = self._read_barrel(barrel_id)
+        if barrel is None:
+            # Unreadable barrels are not cached so a later call can retry
             return {}
+        
+        self._barrel_cache[barrel_id] = barrel
+        if len(self._barrel_cache) > self.cache_size:
+            self._barrel_cache.popitem(last=False)
+        return barrel
+
+    def _read_barrel(self, barrel_id):
+        """
+        Read a barrel from the store, bypassing the cache.
+        
+        Args:
+            barrel_id: ID of the barrel to read
+            
+        Returns:
+            Barrel (or read-only legacy mapping), EMPTY_BARREL if not
+            found, None on error
+        """
+        # The postings file extension tells how the barrel was written
+        compressed_name, offsets_name = self._barrel_names(barrel_id, compressed=True)
+        postings_name = self._barrel_names(barrel_id)[0]
+        compressed = self.store.exists(compressed_name)
+        
+        if not compressed and not self.store.exists(postings_name):
+            return self._load_legacy_barrel(barrel_id)
             
         try:
-            with open(barrel_path, 'rb') as f:
-                return pickle.load(f)
+            offsets = self.store.map_npy(offsets_name, self.populate)
+            if compressed:
+                version, postings = self.store.map_postings_bin(compressed_name, self.populate)
+                if version != FORMAT_VARBYTE:
+                    raise ValueError(f"unknown postings format version {version}")
+            else:
+                postings = self.store.map_npy(postings_name, self.populate)
         except Exception as e:
             print(f"Error loading barrel {barrel_id}: {e}")
-            return {}
+            return None
+        
+        return Barrel(barrel_id * self.barrel_size, offsets, postings, compressed)
+
+    def _load_legacy_barrel(self, barrel_id):
+        """
+        Load a barrel written as a pickled dict by older versions.
+        The result is cached and shared, so it is returned read-only, with
+        the posting lists as read-only int32 arrays like a mapped Barrel's.
+        """
+        barrel_name = f"barrel_{barrel_id}.pkl"
+        
+        if not self.store.exists(barrel_name):
+            return EMPTY_BARREL
+            
+        try:
+            data = pickle.loads(self.store.read_bytes(barrel_name))
+        except Exception as e:
+            print(f"Error loading barrel {barrel_id}: {e}")
+            return None
+        
+        barrel = {}
+        for word_id, doc_ids in data.items():
+            doc_ids = np.array(doc_ids, dtype=np.int32)
+            doc_ids.flags.writeable = False
+            barrel[word_id] = doc_ids
+        return MappingProxyType(barrel)
 
     def get_documents_for_word(self, word_id):
         """
@@ -119,8 +650,54 @@ class BarrelManager:
             word_id: Word ID to look up
             
         Returns:
-            List of document IDs
+            int32 array of document IDs (a view into the barrel's postings)
         """
         barrel_id = self.get_barrel_id(word_id)
         barrel_data = self.load_barrel(barrel_id)
-        return barrel_data.get(word_id, [])
+        # Every cached barrel already holds int32 arrays, so this does not copy
+        return np.asarray(barrel_data.get(word_id, ()), dtype=np.int32)
+
+    def get_documents_for_words(self, word_ids, mode='and'):
+        """
+        Get the documents matching a multi-word query.
+        Uses RoaringBitmap intersections/unions when pyroaring is installed,
+        otherwise sorted-array set operations.
+        
+        Args:
+            word_ids: Word IDs to combine
+            mode: 'and' for documents containing every word, 'or' for
+                  documents containing any of them
+            
+        Returns:
+            Sorted int32 array of document IDs
+        """
+        if mode not in ('and', 'or'):
+            raise ValueError(f"Unknown query mode: {mode}")
+        if not word_ids:
+            return np.empty(0, dtype=np.int32)
+        
+        if BitMap is not None:
+            bitmaps = []
+            for word_id in word_ids:
+                barrel = self.load_barrel(self.get_barrel_id(word_id))
+                if isinstance(barrel, Barrel):
+                    bitmaps.append(barrel.bitmap(word_id))
+                else:
+                    bitmaps.append(_to_bitmap(barrel.get(word_id, ())))
+            combine = BitMap.intersection if mode == 'and' else BitMap.union
+            result = combine(*bitmaps)
+            return np.frombuffer(result.to_array(), dtype=np.uint32).astype(np.int32)
+        
+        postings = [np.asarray(self.get_documents_for_word(word_id), dtype=np.int32)
+                    for word_id in word_ids]
+        if mode == 'or':
+            return np.unique(np.concatenate(postings))
+        
+        # Intersect the shortest lists first so the running result stays small
+        postings.sort(key=len)
+        result = np.unique(postings[0])
+        for doc_ids in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, doc_ids, assume_unique=True)
+        return result
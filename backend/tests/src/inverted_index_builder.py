@@ -3,9 +3,11 @@ Inverted Index Builder Module
 Creates a word-to-documents mapping (inverted index).
 """
 
-import pickle
 import os
-from collections import defaultdict
+
+import numpy as np
+
+from .forward_index_builder import ForwardIndex
 
 
 class InvertedIndexBuilder:
@@ -28,27 +30,68 @@ class InvertedIndexBuilder:
         """
         Build inverted index from forward index and store in barrels.
         
+        The forward index is inverted with a single sort over packed
+        (word_id, row) keys, so every word's posting list comes out as a
+        contiguous run in forward index order. Barrels are then decoded and
+        flushed a few at a time in word order, so only the sorted keys and
+        the barrels being written are held in memory.
+        
         Args:
-            forward_index: Dictionary mapping doc_id to list of word_ids
+            forward_index: ForwardIndex, or dictionary mapping doc_id to list of word_ids
         """
         print("Building inverted index (using barrels)...")
         
-        count = 0
-        # Invert the forward index
-        for doc_id, word_ids in forward_index.items():
-            for word_id in word_ids:
-                # Add to barrel buffer
-                self.barrel_manager.add_to_barrel(word_id, doc_id)
+        if not isinstance(forward_index, ForwardIndex):
+            forward_index = ForwardIndex.from_mapping(forward_index)
+        
+        # One word_id << 32 | row key per token occurrence; a plain sort of
+        # the keys is several times faster than a stable argsort of word_ids
+        keys = np.repeat(np.arange(len(forward_index.doc_ids), dtype=np.int64),
+                         np.diff(forward_index.offsets))
+        keys |= forward_index.values.astype(np.int64) << 32
+        keys.sort()
+        
+        # Key ranges of the barrels, found by binary search on barrel edges
+        edges = []
+        if len(keys):
+            first_barrel = self.barrel_manager.get_barrel_id(int(keys[0] >> 32))
+            last_barrel = self.barrel_manager.get_barrel_id(int(keys[-1] >> 32))
+            first_words = np.arange(first_barrel, last_barrel + 2, dtype=np.int64)
+            first_words *= self.barrel_manager.barrel_size
+            edges = np.searchsorted(keys, first_words << 32).tolist()
+        
+        # Flush as many barrels at once as there are writer threads
+        batch_size = max(1, self.barrel_manager.write_workers)
+        num_words = 0
+        pending = 0
+        for i in range(len(edges) - 1):
+            barrel_keys = keys[edges[i]:edges[i + 1]]
+            if not len(barrel_keys):
+                continue
+            
+            # Drop repeated keys from words occurring twice in a document
+            barrel_keys = barrel_keys[np.append(True, barrel_keys[1:] != barrel_keys[:-1])]
+            words = (barrel_keys >> 32).astype(np.int32)
+            docs = forward_index.doc_ids[barrel_keys & 0xFFFFFFFF].astype(np.int32)
+            
+            # Per-word slice boundaries into the barrel's sorted postings
+            starts = np.flatnonzero(np.append(True, words[1:] != words[:-1]))
+            bounds = np.append(starts, len(words)).tolist()
+            
+            # Slices are views into docs, handed over without copying
+            for j, word_id in enumerate(words[starts].tolist()):
+                self.barrel_manager.add_postings(word_id, docs[bounds[j]:bounds[j + 1]])
+            num_words += len(starts)
             
-            count += 1
-            # Progress indicator & periodic flush
-            if count % 10000 == 0:
-                print(f"Processed {count} documents...")
-                # Optional: flush periodically to save memory if dataset is huge
-                # self.barrel_manager.flush_barrels()
+            pending += 1
+            if pending == batch_size:
+                self.barrel_manager.flush_barrels()
+                pending = 0
         
-        # Final flush to save all data
-        self.barrel_manager.flush_barrels()
+        # Final flush to save all remaining data
+        if pending or not edges:
+            self.barrel_manager.flush_barrels()
+        print(f"Inverted {len(forward_index)} documents into {num_words} posting lists")
         print("Inverted index built and saved to barrels.")
 
 
@@ -1,6 +1,6 @@
 """
 Main IPL Search Engine Indexing Pipeline
-Orchestrates the entire indexing process: preprocessing -> lexicon -> forward index -> inverted index
+Orchestrates the entire indexing process: preprocessing -> lexicon + forward index -> inverted index
 """
 
 import time
@@ -8,7 +8,7 @@ import os
 from src.document_processor import DocumentProcessor
 from src.lexicon_builder import LexiconBuilder
 from src.forward_index_builder import ForwardIndexBuilder
-from src.inverted_index_builder import InvertedIndexBuilder
+from src.index_pipeline import IndexPipeline
 
 
 def build_indices(dataset_path, max_docs=None, output_dir='.'):
@@ -29,12 +29,8 @@ def build_indices(dataset_path, max_docs=None, output_dir='.'):
     
     start_time = time.time()
     
-    # Step 1: Process documents
-    print("\n[1/4] Processing Documents")
-    print("-" * 80)
+    # Documents are streamed from the dataset and indexed in a single pass
     processor = DocumentProcessor(dataset_path)
-    processor.process_documents(max_docs=max_docs)
-    documents = processor.get_documents()
     
     # Create separate directories for each component (simulating distributed nodes)
     lexicon_dir = os.path.join(output_dir, 'lexicon_data')
@@ -45,22 +41,8 @@ def build_indices(dataset_path, max_docs=None, output_dir='.'):
         if not os.path.exists(d):
             os.makedirs(d)
     
-    # Step 2: Build lexicon
-    print("\n[2/4] Building Lexicon")
-    print("-" * 80)
-    lex_builder = LexiconBuilder()
-    lexicon = lex_builder.build_from_documents(documents)
-    lex_builder.save_to_file(os.path.join(lexicon_dir, 'lexicon.pkl'))
-    
-    # Step 3: Build forward index
-    print("\n[3/4] Building Forward Index")
-    print("-" * 80)
-    fwd_builder = ForwardIndexBuilder(lexicon)
-    forward_index = fwd_builder.build_from_documents(documents)
-    fwd_builder.save_to_file(os.path.join(forward_dir, 'forward_index.pkl'))
-    
-    # Step 4: Build inverted index
-    print("\n[4/4] Building Inverted Index (with Barrels)")
+    # Step 1: Build lexicon + forward index (one pass over the documents)
+    print("\n[1/3] Processing Documents")
     print("-" * 80)
     
     # Initialize barrel manager
@@ -68,22 +50,34 @@ def build_indices(dataset_path, max_docs=None, output_dir='.'):
     # Barrels go inside the inverted index directory
     barrel_mgr = BarrelManager(output_dir=inverted_dir)
     
-    # Build inverted index
-    inv_builder = InvertedIndexBuilder(barrel_mgr)
-    inv_builder.build_from_forward_index(forward_index)
+    pipeline = IndexPipeline(barrel_mgr)
+    pipeline.add_token_array(*processor.load_token_arrays(max_docs=max_docs))
+    
+    # Step 2: Build inverted index
+    print("\n[2/3] Building Inverted Index (with Barrels)")
+    print("-" * 80)
+    lexicon, forward_index = pipeline.finish()
+    
+    # Step 3: Save lexicon and forward index
+    print("\n[3/3] Saving Lexicon and Forward Index")
+    print("-" * 80)
+    LexiconBuilder.from_lexicon(lexicon).save_to_file(
+        os.path.join(lexicon_dir, 'lexicon.msgpack'))
+    ForwardIndexBuilder(lexicon, forward_index).save_to_file(
+        os.path.join(forward_dir, 'forward_index.npz'))
     
     # Summary
     elapsed_time = time.time() - start_time
     print("\n" + "=" * 80)
     print("INDEXING COMPLETE!")
     print("=" * 80)
-    print(f"Total documents processed: {len(documents):,}")
+    print(f"Total documents processed: {len(forward_index):,}")
     print(f"Unique words in lexicon: {len(lexicon):,}")
     print(f"Time taken: {elapsed_time:.2f} seconds")
     print(f"\nIndex data saved to separate folders:")
-    print(f"  - {lexicon_dir}/lexicon.pkl")
-    print(f"  - {forward_dir}/forward_index.pkl")
-    print(f"  - {inverted_dir}/barrel_*.pkl")
+    print(f"  - {lexicon_dir}/lexicon.msgpack")
+    print(f"  - {forward_dir}/forward_index.npz")
+    print(f"  - {inverted_dir}/barrel_*_postings.npy, barrel_*_offsets.npy")
     print("=" * 80)
     
     return lexicon, forward_index, barrel_mgr
@@ -3,40 +3,121 @@ Document Processor Module
 Handles loading and processing IPL dataset into searchable documents.
 """
 
+import csv
+import os
+from multiprocessing import Pool
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
 from .preprocessor import TextPreprocessor
 
 
+def document_tokens(doc):
+    """
+    Get the ID and tokens of a document.
+    
+    Args:
+        doc: Document dictionary with 'doc_id' and 'tokens', or a
+             (doc_id, tokens) tuple as yielded by iter_documents
+        
+    Returns:
+        Tuple of (doc_id, tokens)
+    """
+    if isinstance(doc, dict):
+        return doc.get('doc_id'), doc.get('tokens', [])
+    return doc
+
+
 class DocumentProcessor:
     """Processes CSV data into searchable documents."""
     
-    def __init__(self, dataset_path, preprocessor=None):
+    # Fields to include in the document
+    TEXT_FIELDS = [
+        'match_name',
+        'home_team', 
+        'away_team',
+        'batsman1_name',
+        'batsman2_name',
+        'bowler1_name',
+        'bowler2_name',
+        'shortText',
+        'text',
+        'wkt_batsman_name',
+        'wkt_bowler_name',
+        'wkt_text'
+    ]
+    
+    # Fields stored as metadata for search results
+    METADATA_FIELDS = ['match_name', 'season', 'home_team', 'away_team', 'over', 'ball']
+    
+    # Documents handed to a tokenizer worker at a time
+    CHUNK_SIZE = 1000
+    
+    # Bytes of CSV parsed per block by each pyarrow reader thread
+    CSV_BLOCK_SIZE = 1 << 20
+    
+    def __init__(self, dataset_path, preprocessor=None, workers=None):
         """
         Initialize document processor.
         
         Args:
             dataset_path: Path to the CSV dataset file
             preprocessor: TextPreprocessor instance (creates default if None)
+            workers: Number of tokenizer processes (None for one per CPU)
         """
         self.dataset_path = dataset_path
         self.preprocessor = preprocessor or TextPreprocessor(remove_stopwords=False)
+        self.workers = workers or os.cpu_count() or 1
         self.documents = []
         self.doc_metadata = []
     
-    def load_dataset(self, max_rows=None):
+    def load_dataset(self, max_rows=None, columns=None):
         """
         Load the CSV dataset.
+        Parsing is done by pyarrow's multithreaded CSV reader.
         
         Args:
             max_rows: Maximum number of rows to load (None for all)
+            columns: Columns to load, skipping any missing from the file
+                     (None for all)
             
         Returns:
             DataFrame with loaded data
         """
         print(f"Loading dataset from {self.dataset_path}...")
         
-        # Load CSV with low_memory=False to handle mixed types
-        df = pd.read_csv(self.dataset_path, low_memory=False, nrows=max_rows)
+        with open(self.dataset_path, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), [])
+        if columns is not None:
+            header = [column for column in header if column in columns]
+        
+        read_options = pacsv.ReadOptions(block_size=self.CSV_BLOCK_SIZE)
+        convert_options = pacsv.ConvertOptions(
+            include_columns=header,
+            # Text columns may be empty for a whole block; never infer them
+            column_types={field: pa.string() for field in self.TEXT_FIELDS if field in header},
+            strings_can_be_null=True
+        )
+        
+        if max_rows is None:
+            table = pacsv.read_csv(self.dataset_path, read_options=read_options,
+                                   convert_options=convert_options)
+        else:
+            # Stream blocks and stop as soon as enough rows have been parsed
+            reader = pacsv.open_csv(self.dataset_path, read_options=read_options,
+                                    convert_options=convert_options)
+            batches = []
+            num_rows = 0
+            for batch in reader:
+                batches.append(batch)
+                num_rows += batch.num_rows
+                if num_rows >= max_rows:
+                    break
+            table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, max_rows)
+        
+        df = table.to_pandas()
         
         print(f"Loaded {len(df)} records")
         return df
@@ -52,30 +133,103 @@ class DocumentProcessor:
         Returns:
             Combined text string
         """
-        # Fields to include in the document
-        fields = [
-            'match_name',
-            'home_team', 
-            'away_team',
-            'batsman1_name',
-            'batsman2_name',
-            'bowler1_name',
-            'bowler2_name',
-            'shortText',
-            'text',
-            'wkt_batsman_name',
-            'wkt_bowler_name',
-            'wkt_text'
-        ]
-        
         # Combine non-null field values
         text_parts = []
-        for field in fields:
+        for field in self.TEXT_FIELDS:
             if field in row and pd.notna(row[field]):
                 text_parts.append(str(row[field]))
         
         return ' '.join(text_parts)
     
+    def create_document_texts(self, df):
+        """
+        Create searchable text for every row of a DataFrame at once.
+        Equivalent to create_document_text on each row, but built with
+        whole-column operations.
+        
+        Args:
+            df: DataFrame of dataset rows
+            
+        Returns:
+            List of combined text strings, one per row
+        """
+        present = [field for field in self.TEXT_FIELDS if field in df.columns]
+        if not present:
+            return [''] * len(df)
+        
+        text = None
+        started = None
+        for field in present:
+            column = df[field]
+            present_mask = column.notna().to_numpy()
+            part = np.where(present_mask, column.astype(str).to_numpy(dtype=object), '')
+            
+            if text is None:
+                text, started = part, present_mask
+                continue
+            
+            # Separate from earlier parts only where both sides have a value
+            sep = np.where(present_mask & started, ' ', '')
+            text = text + sep + part
+            started = started | present_mask
+        
+        return text.tolist()
+    
+    def tokenize_texts(self, texts):
+        """
+        Tokenize document texts, in parallel worker processes for large inputs.
+        
+        Args:
+            texts: List of document text strings
+            
+        Returns:
+            Iterator of token lists, in input order
+        """
+        if self.workers <= 1 or len(texts) < 2 * self.CHUNK_SIZE:
+            yield from map(self.preprocessor.preprocess, texts)
+            return
+        
+        with Pool(self.workers) as pool:
+            yield from pool.imap(self.preprocessor.preprocess, texts,
+                                 chunksize=self.CHUNK_SIZE)
+    
+    def iter_documents(self, max_docs=None):
+        """
+        Stream tokenized documents without keeping them in memory.
+        
+        Args:
+            max_docs: Maximum number of documents to process (None for all)
+            
+        Yields:
+            Tuples of (doc_id, tokens)
+        """
+        df = self.load_dataset(max_rows=max_docs, columns=self.TEXT_FIELDS)
+        texts = self.create_document_texts(df)
+        doc_ids = df.index.tolist()
+        del df
+        
+        yield from zip(doc_ids, self.tokenize_texts(texts))
+    
+    def load_token_arrays(self, max_docs=None):
+        """
+        Tokenize the dataset in one batch with pyarrow compute kernels,
+        without building a Python list of tokens per document.
+        
+        Args:
+            max_docs: Maximum number of documents to process (None for all)
+            
+        Returns:
+            Tuple of (doc_ids, offsets, tokens), see
+            TextPreprocessor.tokenize_array
+        """
+        df = self.load_dataset(max_rows=max_docs, columns=self.TEXT_FIELDS)
+        texts = self.create_document_texts(df)
+        doc_ids = df.index.tolist()
+        del df
+        
+        offsets, tokens = self.preprocessor.tokenize_array(texts)
+        return doc_ids, offsets, tokens
+    
     def process_documents(self, max_docs=None):
         """
         Process all documents from the dataset.
@@ -87,18 +241,17 @@ class DocumentProcessor:
             Number of documents processed
         """
         # Load dataset
-        df = self.load_dataset(max_rows=max_docs)
+        df = self.load_dataset(max_rows=max_docs,
+                               columns=self.TEXT_FIELDS + self.METADATA_FIELDS)
         
         print("Processing documents...")
         
+        texts = self.create_document_texts(df)
+        metadata = df.reindex(columns=self.METADATA_FIELDS, fill_value='N/A').to_dict('records')
+        
         # Process each row
-        for idx, row in df.iterrows():
-            # Create document text
-            doc_text = self.create_document_text(row)
-            
-            # Tokenize the text
-            tokens = self.preprocessor.preprocess(doc_text)
-            
+        rows = zip(df.index.tolist(), texts, self.tokenize_texts(texts), metadata)
+        for count, (idx, doc_text, tokens, meta) in enumerate(rows, 1):
             # Store document
             self.documents.append({
                 'doc_id': idx,
@@ -107,19 +260,11 @@ class DocumentProcessor:
             })
             
             # Store metadata for search results
-            self.doc_metadata.append({
-                'doc_id': idx,
-                'match_name': row.get('match_name', 'N/A'),
-                'season': row.get('season', 'N/A'),
-                'home_team': row.get('home_team', 'N/A'),
-                'away_team': row.get('away_team', 'N/A'),
-                'over': row.get('over', 'N/A'),
-                'ball': row.get('ball', 'N/A')
-            })
+            self.doc_metadata.append({'doc_id': idx, **meta})
             
             # Progress indicator
-            if (idx + 1) % 10000 == 0:
-                print(f"Processed {idx + 1} documents...")
+            if count % 10000 == 0:
+                print(f"Processed {count} documents...")
         
         print(f"Total documents processed: {len(self.documents)}")
         return len(self.documents)
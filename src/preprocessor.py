@@ -3,8 +3,44 @@ Text Preprocessing Module
 Handles text cleaning, tokenization, and normalization for the IPL Search Engine.
 """
 
-import re
 import string
+from sys import intern
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+class _CleanTable(dict):
+    """
+    str.translate table that keeps lowercase ASCII letters and digits,
+    turns whitespace into a plain space and every other character into a
+    space. Characters outside the precomputed ASCII range are resolved on
+    first sight and then cached.
+    """
+    
+    KEEP = frozenset(string.ascii_lowercase + string.digits)
+    
+    def __init__(self):
+        super().__init__()
+        for code in range(128):
+            self.__missing__(code)
+    
+    def __missing__(self, code):
+        char = chr(code)
+        value = code if char in self.KEEP else ' '
+        self[code] = value
+        return value
+
+
+# Byte -> cleaned byte for ASCII text: letters are lowercased, digits kept
+# and everything else becomes a space (what lower() + _CleanTable does)
+_ASCII_CLEAN = np.full(256, ord(' '), dtype=np.uint8)
+for _code in range(128):
+    _char = chr(_code).lower()
+    if _char in _CleanTable.KEEP:
+        _ASCII_CLEAN[_code] = ord(_char)
+
 
 class TextPreprocessor:
     """Preprocesses text for indexing."""
@@ -24,6 +60,9 @@ class TextPreprocessor:
             'from', 'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 
             'that', 'the', 'to', 'was', 'will', 'with'
         }
+        
+        # Translation table replacing everything but [a-z0-9] with spaces
+        self._trans = _CleanTable()
     
     def clean_text(self, text):
         """
@@ -38,16 +77,8 @@ class TextPreprocessor:
         if not text or not isinstance(text, str):
             return ""
         
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^a-z0-9\s]', ' ', text)
-        
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        
-        return text
+        # Lowercase, remove special characters and extra whitespace
+        return ' '.join(text.lower().translate(self._trans).split())
     
     def tokenize(self, text):
         """
@@ -59,23 +90,59 @@ class TextPreprocessor:
         Returns:
             List of word tokens
         """
-        # Clean the text first
-        cleaned_text = self.clean_text(text)
-        
-        if not cleaned_text:
+        if not text or not isinstance(text, str):
             return []
         
-        # Split by whitespace
-        tokens = cleaned_text.split()
+        # Clean and split in one pass, without re-joining the cleaned text
+        tokens = text.lower().translate(self._trans).split()
         
-        # Remove stop words if enabled
+        # Filter out very short tokens (single characters) and, if enabled,
+        # stop words in the same pass
         if self.remove_stopwords:
-            tokens = [word for word in tokens if word not in self.stopwords]
+            stopwords = self.stopwords
+            return [intern(word) for word in tokens
+                    if len(word) > 1 and word not in stopwords]
+        
+        return [intern(word) for word in tokens if len(word) > 1]
+    
+    def tokenize_array(self, texts):
+        """
+        Tokenize many texts at once with pyarrow compute kernels.
+        Gives exactly the tokens tokenize() gives for each text. ASCII text
+        is cleaned with a byte lookup table over the whole Arrow buffer; the
+        rare non-ASCII text is cleaned in Python first, since lower() maps
+        some non-ASCII characters to ASCII letters.
+        
+        Args:
+            texts: Sequence of text strings
+            
+        Returns:
+            Tuple of (offsets, tokens): the tokens of text i are
+            tokens[offsets[i]:offsets[i + 1]] of the flat pyarrow string array
+        """
+        texts = [text if type(text) is str and text.isascii() else self.clean_text(text)
+                 for text in texts]
+        array = pa.array(texts, type=pa.large_string())
+        _, value_offsets, data = array.buffers()
+        if data is not None:
+            data = pa.py_buffer(_ASCII_CLEAN[np.frombuffer(data, dtype=np.uint8)])
+        cleaned = pa.LargeStringArray.from_buffers(len(array), value_offsets, data)
+        
+        words = pc.split_pattern(cleaned, ' ')
+        flat = words.flatten()
         
-        # Filter out very short tokens (single characters)
-        tokens = [word for word in tokens if len(word) > 1]
+        # Same filters as tokenize(); empty strings from repeated spaces go too
+        keep = pc.greater(pc.binary_length(flat), 1)
+        if self.remove_stopwords:
+            stopwords = pa.array(sorted(self.stopwords), type=pa.large_string())
+            keep = pc.and_(keep, pc.invert(pc.is_in(flat, value_set=stopwords)))
+        keep_mask = keep.to_numpy(zero_copy_only=False)
         
-        return tokens
+        parents = pc.list_parent_indices(words).to_numpy()
+        counts = np.bincount(parents[keep_mask], minlength=len(texts))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets, flat.filter(keep)
     
     def preprocess(self, text):
         """
@@ -4,67 +4,196 @@ Creates a document-to-words mapping (forward index).
 """
 
 import pickle
+from collections.abc import Mapping
+from itertools import chain, repeat
+
+import msgpack
+import numpy as np
+
+from .document_processor import document_tokens
+
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+# Saves go through one large buffer instead of the default 8 KiB one
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+class ForwardIndex(Mapping):
+    """
+    Read-only doc_id -> word_ids mapping stored in CSR layout.
+    
+    All word IDs live in one flat int32 array; the words of the i-th
+    document are values[offsets[i]:offsets[i + 1]].
+    """
+    
+    def __init__(self, doc_ids, offsets, values):
+        """
+        Initialize the forward index.
+        
+        Args:
+            doc_ids: Array of document IDs (rows are sorted by ID if needed)
+            offsets: int64 array of length len(doc_ids) + 1
+            values: Flat int32 array of word IDs
+        """
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.int32)
+        if np.any(self.doc_ids[1:] < self.doc_ids[:-1]):
+            self._sort_rows()
+        # Documents are usually numbered 0..n-1, so doc_id is its own position
+        self._dense = bool(np.array_equal(self.doc_ids, np.arange(len(self.doc_ids))))
+    
+    def _sort_rows(self):
+        """Stably reorder the CSR rows so doc_ids are ascending."""
+        order = np.argsort(self.doc_ids, kind='stable')
+        lengths = np.diff(self.offsets)[order]
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Position of every value in the old layout, row by row in new order
+        shift = np.repeat(self.offsets[:-1][order] - offsets[:-1], lengths)
+        self.values = self.values[shift + np.arange(offsets[-1])]
+        self.doc_ids = self.doc_ids[order]
+        self.offsets = offsets
+    
+    @classmethod
+    def from_mapping(cls, mapping):
+        """
+        Build a forward index from a legacy doc_id -> list of word_ids dict.
+        
+        Args:
+            mapping: Dictionary mapping doc_id to word IDs
+            
+        Returns:
+            ForwardIndex instance
+        """
+        doc_ids = sorted(mapping)
+        lengths = np.fromiter((len(mapping[d]) for d in doc_ids), dtype=np.int64,
+                              count=len(doc_ids))
+        offsets = np.zeros(len(doc_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.fromiter(chain.from_iterable(mapping[d] for d in doc_ids),
+                             dtype=np.int32, count=int(offsets[-1]))
+        return cls(doc_ids, offsets, values)
+    
+    def _position(self, doc_id):
+        """Return the row of doc_id in the CSR arrays, or None if absent."""
+        if self._dense:
+            pos = doc_id if 0 <= doc_id < len(self.doc_ids) else None
+        else:
+            pos = int(np.searchsorted(self.doc_ids, doc_id))
+            if pos == len(self.doc_ids) or self.doc_ids[pos] != doc_id:
+                pos = None
+        return pos
+    
+    def __getitem__(self, doc_id):
+        pos = self._position(doc_id)
+        if pos is None:
+            raise KeyError(doc_id)
+        return self.values[self.offsets[pos]:self.offsets[pos + 1]]
+    
+    def __iter__(self):
+        return iter(self.doc_ids.tolist())
+    
+    def __len__(self):
+        return len(self.doc_ids)
+    
+    def items(self):
+        """Iterate (doc_id, word_ids) pairs without a lookup per document."""
+        offsets = self.offsets.tolist()
+        for pos, doc_id in enumerate(self.doc_ids.tolist()):
+            yield doc_id, self.values[offsets[pos]:offsets[pos + 1]]
+    
+    def to_arrays(self):
+        """Return the underlying (doc_ids, offsets, values) arrays."""
+        return {'doc_ids': self.doc_ids, 'offsets': self.offsets, 'values': self.values}
 
 
 class ForwardIndexBuilder:
     """Builds and manages the forward index (doc_id -> word_ids)."""
     
-    def __init__(self, lexicon):
+    def __init__(self, lexicon, forward_index=None):
         """
         Initialize the forward index builder.
         
         Args:
             lexicon: Dictionary mapping words to word IDs
+            forward_index: Existing ForwardIndex to manage, e.g. one built by
+                           LexiconAndForwardBuilder (optional)
         """
         self.lexicon = lexicon
-        self.forward_index = {}
+        if forward_index is None:
+            forward_index = ForwardIndex([], [0], [])
+        self.forward_index = forward_index
     
     def build_from_documents(self, documents):
         """
         Build forward index from processed documents.
+        The documents are consumed in a single pass and written straight
+        into the CSR arrays.
         
         Args:
-            documents: List of document dictionaries with 'doc_id' and 'tokens'
+            documents: Iterable of document dictionaries with 'doc_id' and
+                       'tokens', or of (doc_id, tokens) tuples
             
         Returns:
-            Dictionary mapping doc_id to list of word_ids
+            ForwardIndex mapping doc_id to an int32 array of word_ids
         """
         print("Building forward index...")
         
-        for doc in documents:
-            doc_id = doc['doc_id']
-            tokens = doc.get('tokens', [])
-            
-            # Convert words to word IDs
-            word_ids = []
-            for token in tokens:
-                word_id = self.lexicon.get(token)
-                if word_id is not None:
-                    word_ids.append(word_id)
-            
-            # Store in forward index
-            self.forward_index[doc_id] = word_ids
+        doc_ids = []
+        lengths = []
+        
+        def doc_tokens(doc):
+            doc_id, tokens = document_tokens(doc)
+            doc_ids.append(doc_id)
+            lengths.append(len(tokens))
             
             # Progress indicator
-            if (doc_id + 1) % 10000 == 0:
-                print(f"Processed {doc_id + 1} documents...")
+            if len(doc_ids) % 10000 == 0:
+                print(f"Processed {len(doc_ids)} documents...")
+            return tokens
+        
+        # Convert every token of the corpus to its word ID in one C-level
+        # pass (unknown words map to -1)
+        tokens = chain.from_iterable(map(doc_tokens, documents))
+        values = np.fromiter(map(self.lexicon.get, tokens, repeat(-1)), dtype=np.int32)
+        
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        
+        known = values >= 0
+        if not known.all():
+            kept = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum(known, out=kept[1:])
+            offsets = kept[offsets]
+            values = values[known]
+        
+        self.forward_index = ForwardIndex(doc_ids, offsets, values)
         
         print(f"Forward index built for {len(self.forward_index)} documents")
         return self.forward_index
     
-    def save_to_file(self, filepath='forward_index.pkl'):
+    def save_to_file(self, filepath='forward_index.npz'):
         """
         Save forward index to a file.
+        Files ending in .npz store the raw CSR arrays, .msgpack files store a
+        doc_id -> word_ids map, anything else falls back to pickle.
         
         Args:
             filepath: Path to save the forward index
         """
         print(f"Saving forward index to {filepath}...")
-        with open(filepath, 'wb') as f:
-            pickle.dump(self.forward_index, f)
+        with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            if filepath.endswith('.npz'):
+                np.savez(f, **self.forward_index.to_arrays())
+            elif filepath.endswith('.msgpack'):
+                data = {doc_id: word_ids.tolist()
+                        for doc_id, word_ids in self.forward_index.items()}
+                f.write(msgpack.packb(data, use_bin_type=True))
+            else:
+                pickle.dump(self.forward_index.to_arrays(), f, protocol=PICKLE_PROTOCOL)
         print(f"Forward index saved successfully ({len(self.forward_index)} documents)")
     
-    def load_from_file(self, filepath='forward_index.pkl'):
+    def load_from_file(self, filepath='forward_index.npz'):
         """
         Load forward index from a file.
         
@@ -72,11 +201,24 @@ class ForwardIndexBuilder:
             filepath: Path to load the forward index from
             
         Returns:
-            Loaded forward index dictionary
+            Loaded ForwardIndex
         """
         print(f"Loading forward index from {filepath}...")
         with open(filepath, 'rb') as f:
-            self.forward_index = pickle.load(f)
+            if filepath.endswith('.npz'):
+                with np.load(f) as arrays:
+                    self.forward_index = ForwardIndex(**arrays)
+            elif filepath.endswith('.msgpack'):
+                # doc_id keys are ints, which msgpack rejects by default
+                data = msgpack.unpackb(f.read(), raw=False, strict_map_key=False)
+                self.forward_index = ForwardIndex.from_mapping(data)
+            else:
+                data = pickle.load(f)
+                if set(data) == {'doc_ids', 'offsets', 'values'}:
+                    self.forward_index = ForwardIndex(**data)
+                else:
+                    # Legacy doc_id -> list of word_ids pickle
+                    self.forward_index = ForwardIndex.from_mapping(data)
         print(f"Forward index loaded successfully ({len(self.forward_index)} documents)")
         return self.forward_index
     
@@ -88,9 +230,9 @@ class ForwardIndexBuilder:
             doc_id: Document ID
             
         Returns:
-            List of word IDs in the document
+            Array of word IDs in the document (a view into the CSR buffer)
         """
-        return self.forward_index.get(doc_id, [])
+        return self.forward_index.get(doc_id, np.empty(0, dtype=np.int32))
     
     def get_forward_index(self):
         """Get the complete forward index."""
@@ -120,7 +262,7 @@ if __name__ == "__main__":
     print("-" * 50)
     for doc_id in list(forward_index.keys())[:3]:
         word_ids = forward_index[doc_id]
-        print(f"Doc {doc_id}: {len(word_ids)} words -> {word_ids[:10]}...")
+        print(f"Doc {doc_id}: {len(word_ids)} words -> {word_ids[:10].tolist()}...")
     
     # Save to file
     fwd_builder.save_to_file('test_forward_index.pkl')
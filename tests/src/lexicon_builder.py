@@ -5,6 +5,15 @@ Creates a word-to-ID mapping (lexicon) from processed documents.
 
 import pickle
 from collections import OrderedDict
+from itertools import chain
+
+import msgpack
+
+from .document_processor import document_tokens
+
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+# Saves go through one large buffer instead of the default 8 KiB one
+WRITE_BUFFER_SIZE = 1 << 20
 
 
 class LexiconBuilder:
@@ -15,49 +24,72 @@ class LexiconBuilder:
         self.lexicon = {}  # word -> word_id mapping
         self.next_word_id = 0
     
+    @classmethod
+    def from_lexicon(cls, lexicon):
+        """
+        Create a builder around an existing lexicon, e.g. one built by
+        LexiconAndForwardBuilder, so it can be saved or extended.
+        
+        Args:
+            lexicon: Dictionary mapping words to word IDs 0..n-1
+            
+        Returns:
+            LexiconBuilder instance
+        """
+        builder = cls()
+        builder.lexicon = lexicon
+        builder.next_word_id = len(lexicon)
+        return builder
+    
     def build_from_documents(self, documents):
         """
-        Build lexicon from a list of processed documents.
+        Build lexicon from processed documents.
+        The documents are consumed in a single pass, so a stream from
+        DocumentProcessor.iter_documents works without materializing it.
         
         Args:
-            documents: List of document dictionaries with 'tokens' field
+            documents: Iterable of document dictionaries with 'tokens' field,
+                       or of (doc_id, tokens) tuples
             
         Returns:
             Dictionary mapping words to word IDs
         """
         print("Building lexicon...")
         
-        unique_words = set()
-        
-        # Collect all unique words
-        for doc in documents:
-            tokens = doc.get('tokens', [])
-            unique_words.update(tokens)
+        # Collect all unique words in a single C-level pass
+        unique_words = set(chain.from_iterable(
+            document_tokens(doc)[1] for doc in documents
+        ))
         
         # Sort words for consistent ordering
         sorted_words = sorted(unique_words)
         
         # Assign IDs to words
-        for word in sorted_words:
-            self.lexicon[word] = self.next_word_id
-            self.next_word_id += 1
+        first_id = self.next_word_id
+        self.lexicon.update(zip(sorted_words, range(first_id, first_id + len(sorted_words))))
+        self.next_word_id += len(sorted_words)
         
         print(f"Lexicon built with {len(self.lexicon)} unique words")
         return self.lexicon
     
-    def save_to_file(self, filepath='lexicon.pkl'):
+    def save_to_file(self, filepath='lexicon.msgpack'):
         """
         Save lexicon to a file.
+        Files ending in .msgpack are written with msgpack, anything else
+        falls back to pickle.
         
         Args:
             filepath: Path to save the lexicon
         """
         print(f"Saving lexicon to {filepath}...")
-        with open(filepath, 'wb') as f:
-            pickle.dump(self.lexicon, f)
+        with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            if filepath.endswith('.msgpack'):
+                f.write(msgpack.packb(self.lexicon, use_bin_type=True))
+            else:
+                pickle.dump(self.lexicon, f, protocol=PICKLE_PROTOCOL)
         print(f"Lexicon saved successfully ({len(self.lexicon)} words)")
     
-    def load_from_file(self, filepath='lexicon.pkl'):
+    def load_from_file(self, filepath='lexicon.msgpack'):
         """
         Load lexicon from a file.
         
@@ -69,7 +101,10 @@ class LexiconBuilder:
         """
         print(f"Loading lexicon from {filepath}...")
         with open(filepath, 'rb') as f:
-            self.lexicon = pickle.load(f)
+            if filepath.endswith('.msgpack'):
+                self.lexicon = msgpack.unpackb(f.read(), raw=False)
+            else:
+                self.lexicon = pickle.load(f)
         self.next_word_id = len(self.lexicon)
         print(f"Lexicon loaded successfully ({len(self.lexicon)} words)")
         return self.lexicon
@@ -7,18 +7,26 @@ import pickle
 import pickle
 import os
 import sys
+import tempfile
+
+import numpy as np
 
 # Add parent directory to path to allow importing from src
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.document_processor import DocumentProcessor
+from src.preprocessor import TextPreprocessor
+from src.index_pipeline import LexiconAndForwardBuilder
 from src.lexicon_builder import LexiconBuilder
 from src.forward_index_builder import ForwardIndexBuilder
 from src.inverted_index_builder import InvertedIndexBuilder
 
 
-def test_indexing_small_dataset():
-    """Test the indexing pipeline with a small dataset."""
+def test_indexing_small_dataset(tmp_path):
+    """
+    Test the indexing pipeline with a small dataset.
+    Index files are written to tmp_path so the tracked fixtures stay untouched.
+    """
     
     print("=" * 80)
     print("TESTING INDEXING PIPELINE")
@@ -68,7 +76,7 @@ def test_indexing_small_dataset():
     # Step 4: Build inverted index
     print("\n[4/4] Building inverted index...")
     from src.barrel_manager import BarrelManager
-    barrel_mgr = BarrelManager(output_dir='test_indexing_barrels')
+    barrel_mgr = BarrelManager(output_dir=os.path.join(tmp_path, 'test_indexing_barrels'))
     inv_builder = InvertedIndexBuilder(barrel_mgr)
     inv_builder.build_from_forward_index(forward_index)
     
@@ -76,13 +84,13 @@ def test_indexing_small_dataset():
     
     # Test bidirectional consistency
     print("\n[5/5] Testing consistency...")
-    test_word = list(lexicon.keys())[0]
+    test_word = next(iter(lexicon))
     test_word_id = lexicon[test_word]
     
     # Get docs from barrel
     docs_with_word = barrel_mgr.get_documents_for_word(test_word_id)
     
-    if docs_with_word:
+    if docs_with_word.size > 0:
         test_doc_id = docs_with_word[0]
         words_in_doc = forward_index[test_doc_id]
         assert test_word_id in words_in_doc, "Consistency check failed!"
@@ -90,19 +98,74 @@ def test_indexing_small_dataset():
     
     # Save test indices
     print("\nSaving test indices...")
-    lex_builder.save_to_file('test_lexicon.pkl')
-    fwd_builder.save_to_file('test_forward_index.pkl')
+    lex_builder.save_to_file(os.path.join(tmp_path, 'test_lexicon.pkl'))
+    fwd_builder.save_to_file(os.path.join(tmp_path, 'test_forward_index.pkl'))
     # inv_builder.save_to_file('test_inverted_index.pkl') # No longer needed with barrels
     
     print("\n" + "=" * 80)
     print("ALL TESTS PASSED! ✓")
     print("=" * 80)
-    print("\nTest index files saved:")
+    print(f"\nTest index files saved to {tmp_path}:")
     print("  - test_lexicon.pkl")
     print("  - test_forward_index.pkl")
     print("  - test_indexing_barrels/")
 
 
+def test_forward_index_out_of_order_documents():
+    """Test that documents added out of doc_id order are still looked up by ID."""
+    lexicon = {'w0': 0, 'w1': 1, 'w2': 2, 'w3': 3}
+    
+    # A permutation of 0..n-1 and a sparse descending order
+    for doc_ids in ([0, 2, 1, 3], [10, 5]):
+        documents = [(doc_id, [f'w{doc_id % 4}'] * (doc_id % 3 + 1)) for doc_id in doc_ids]
+        forward_index = ForwardIndexBuilder(lexicon).build_from_documents(documents)
+        
+        assert list(forward_index) == sorted(doc_ids), "Doc IDs not sorted!"
+        for doc_id, tokens in documents:
+            assert forward_index[doc_id].tolist() == [lexicon[t] for t in tokens], \
+                f"Wrong words for doc {doc_id}!"
+
+
+def test_tokenize_array_matches_tokenize():
+    """Test that batch tokenization gives the same tokens as tokenize()."""
+    processor = DocumentProcessor('Dataset/IPL/all_season_details.csv')
+    df = processor.load_dataset(max_rows=1000, columns=processor.TEXT_FIELDS)
+    texts = processor.create_document_texts(df) + [
+        "  Virat   Kohli's 100* (off 50) -- vs. RCB!! ",
+        "Café Ünïcode naïve façade",
+        "\u212a\u0130STANBUL \u00a0non-breaking\u2009thin space",
+        "a an the I",
+        "",
+        "???",
+    ]
+    
+    for remove_stopwords in (False, True):
+        preprocessor = TextPreprocessor(remove_stopwords=remove_stopwords)
+        offsets, tokens = preprocessor.tokenize_array(texts)
+        tokens = tokens.to_pylist()
+        
+        assert len(offsets) == len(texts) + 1, "Wrong number of offsets!"
+        for i, text in enumerate(texts):
+            assert tokens[offsets[i]:offsets[i + 1]] == preprocessor.tokenize(text), \
+                f"Token mismatch for text {i}: {text[:50]!r}"
+
+
+def test_token_array_build_matches_documents():
+    """Test that the batch path builds the same lexicon and forward index."""
+    processor = DocumentProcessor('Dataset/IPL/all_season_details.csv')
+    processor.process_documents(max_docs=1000)
+    lexicon, forward_index = LexiconAndForwardBuilder().build(processor.get_documents())
+    
+    builder = LexiconAndForwardBuilder()
+    builder.add_token_array(*processor.load_token_arrays(max_docs=1000))
+    batch_lexicon, batch_forward_index = builder.finish()
+    
+    assert batch_lexicon == lexicon, "Lexicon mismatch!"
+    for name, array in forward_index.to_arrays().items():
+        assert np.array_equal(batch_forward_index.to_arrays()[name], array), \
+            f"Forward index {name} mismatch!"
+
+
 if __name__ == "__main__":
     # Run tests
-    test_indexing_small_dataset()
+    test_indexing_small_dataset(tempfile.mkdtemp())